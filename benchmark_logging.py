@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-record logging overhead of the crawl loop.
+
+1. Emission: the same formatted line per record through a synchronous
+   StreamHandler, and through the QueueHandler/QueueListener setup at INFO
+   and DEBUG. Queued runs report the caller's cost and the cost including
+   the listener draining the queue.
+2. Sampling: per-record debug lines against one in every 100, with the
+   debug level enabled, and the production default where debug is off.
+3. ProgressLine.update on a terminal-like stream.
+
+All output goes to /dev/null so the numbers reflect logging, not the terminal.
+"""
+
+import os
+import sys
+import time
+import logging
+
+from scraper_logging import configure_logging, stop_logging, ProgressLine, LOG_FORMAT
+
+RECORDS = 50000
+SAMPLE_EVERY = 100
+MESSAGE = "      Added: %s %s %s - %s"
+ARGS = ("2025", "Acura", "Integra", "Headlight Bulb Low Beam")
+
+
+class TerminalSink:
+    """/dev/null that claims to be a terminal, so ProgressLine rewrites its line"""
+
+    def __init__(self, devnull):
+        self.devnull = devnull
+
+    def write(self, text):
+        return self.devnull.write(text)
+
+    def flush(self):
+        self.devnull.flush()
+
+    def isatty(self):
+        return True
+
+
+def per_record_us(seconds):
+    return seconds / RECORDS * 1e6
+
+
+def synchronous_setup(devnull, level):
+    stop_logging()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    handler = logging.StreamHandler(devnull)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def timed(loop, logger):
+    start = time.perf_counter()
+    loop(logger)
+    return time.perf_counter() - start
+
+
+def timed_queued(loop, logger, devnull, level):
+    """Return (caller seconds, seconds including the listener draining the queue)"""
+    configure_logging(level=level, stream=devnull)
+    start = time.perf_counter()
+    loop(logger)
+    caller = time.perf_counter() - start
+    stop_logging()
+    return caller, time.perf_counter() - start
+
+
+def info_every_record(logger):
+    for i in range(RECORDS):
+        logger.info(MESSAGE, *ARGS)
+
+
+def debug_every_record(logger):
+    for i in range(RECORDS):
+        logger.debug(MESSAGE, *ARGS)
+
+
+def debug_sampled(logger):
+    for i in range(1, RECORDS + 1):
+        if i % SAMPLE_EVERY == 0:
+            logger.debug(MESSAGE, *ARGS)
+
+
+def old_hot_loop(logger):
+    for i in range(RECORDS):
+        logger.info(f"      Added: {ARGS[0]} {ARGS[1]} {ARGS[2]} - {ARGS[3]}")
+
+
+def main():
+    devnull = open(os.devnull, 'w')
+    logger = logging.getLogger("benchmark")
+    print(f"Records: {RECORDS}")
+
+    print("\nEmission, every record (us/record):")
+    synchronous_setup(devnull, logging.INFO)
+    print(f"  synchronous INFO, f-string (old loop): {per_record_us(timed(old_hot_loop, logger)):6.2f}")
+    print(f"  synchronous INFO:                      {per_record_us(timed(info_every_record, logger)):6.2f}")
+    for name, loop, level in (("INFO ", info_every_record, logging.INFO),
+                              ("DEBUG", debug_every_record, logging.DEBUG)):
+        caller, drained = timed_queued(loop, logger, devnull, level)
+        print(f"  queued {name} caller / with drain:      {per_record_us(caller):6.2f} / {per_record_us(drained):6.2f}")
+
+    print("\nSampling, queued with DEBUG enabled (us/record):")
+    caller, drained = timed_queued(debug_every_record, logger, devnull, logging.DEBUG)
+    print(f"  every record caller / with drain:      {per_record_us(caller):6.2f} / {per_record_us(drained):6.2f}")
+    caller, drained = timed_queued(debug_sampled, logger, devnull, logging.DEBUG)
+    print(f"  1 in {SAMPLE_EVERY} caller / with drain:          {per_record_us(caller):6.2f} / {per_record_us(drained):6.2f}")
+    caller, drained = timed_queued(debug_sampled, logger, devnull, logging.INFO)
+    print(f"  1 in {SAMPLE_EVERY}, DEBUG off (default):      {per_record_us(caller):6.2f}")
+
+    progress = ProgressLine(stream=TerminalSink(devnull))
+    start = time.perf_counter()
+    for i in range(RECORDS):
+        progress.update(1, "2025 Acura Integra")
+    print(f"\nProgressLine.update:                     {per_record_us(time.perf_counter() - start):6.2f} us/record")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""
+Bulb part-number enrichment stage for the Sylvania fitment data.
+
+Takes the unique `position_value` ids collected by the scraper, fetches the
+matching Sylvania products concurrently in small batches and joins the part
+numbers back into the fitment records. Results are cached on disk so every
+position is fetched once, no matter how many vehicles share it.
+"""
+
+import csv
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from bs4 import BeautifulSoup
+from fake_useragent import UserAgent
+
+logger = logging.getLogger(__name__)
+
+PART_NUMBER_PATTERN = re.compile(r'Part\s*(?:#|No\b\.?|Number\b)\s*:?\s*([A-Z0-9](?:[A-Z0-9\-/.]*[A-Z0-9])?)', re.IGNORECASE)
+
+
+class BulbPartEnricher:
+    def __init__(self, results_url=None, max_workers=4, batch_size=20, cache_file="bulb_parts_cache.json"):
+        # Result page for a single bulb position with {position_value} as the form value.
+        # The scraper never loads this page, so there is no default: take it from the site
+        self.results_url = results_url
+        self.ua = UserAgent()
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.cache_file = cache_file
+        self.output_file = "sylvania_fitment_parts.csv"
+
+        # Rate limiting settings (applied between batches, not per request)
+        self.min_delay = 1
+        self.max_delay = 3
+        self.retry_attempts = 3
+        self.request_timeout = 20
+
+        self.parts_cache = {}
+        self._local = threading.local()
+
+    def load_cache(self):
+        """Load previously fetched parts keyed by position value"""
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, 'r') as f:
+                    self.parts_cache = json.load(f)
+                logger.info(f"Loaded {len(self.parts_cache)} cached positions")
+            except Exception as e:
+                logger.error(f"Error loading parts cache: {e}")
+        return self.parts_cache
+
+    def save_cache(self):
+        """Write the parts cache atomically so an interrupted run keeps its results"""
+        try:
+            tmp_file = self.cache_file + ".tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(self.parts_cache, f)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            logger.error(f"Error saving parts cache: {e}")
+
+    def get_session(self):
+        """Return a requests session owned by the current worker thread"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({'User-Agent': self.ua.random})
+            self._local.session = session
+        return session
+
+    def parse_results(self, html):
+        """Extract product names and part numbers from a results page"""
+        soup = BeautifulSoup(html, 'lxml')
+        parts = []
+        seen = set()
+
+        for item in soup.select('[data-part-number], .product-item, .product-tile, .product'):
+            part_number = item.get('data-part-number')
+            if not part_number:
+                match = PART_NUMBER_PATTERN.search(item.get_text(' ', strip=True))
+                part_number = match.group(1) if match else None
+            if not part_number or part_number in seen:
+                continue
+
+            name_element = item.select_one('.product-name, .product-title, h2, h3, h4')
+            product_name = name_element.get_text(' ', strip=True) if name_element else ''
+            seen.add(part_number)
+            parts.append({'product_name': product_name, 'part_number': part_number})
+
+        # Fall back to scanning the whole page when the markup has no product blocks
+        if not parts:
+            for match in PART_NUMBER_PATTERN.finditer(soup.get_text(' ', strip=True)):
+                part_number = match.group(1)
+                if part_number not in seen:
+                    seen.add(part_number)
+                    parts.append({'product_name': '', 'part_number': part_number})
+        return parts
+
+    def fetch_parts(self, position_value):
+        """Fetch and parse the parts for one position with retry logic"""
+        url = self.results_url.format(position_value=position_value)
+        for attempt in range(self.retry_attempts):
+            try:
+                response = self.get_session().get(url, timeout=self.request_timeout)
+                response.raise_for_status()
+                return self.parse_results(response.text)
+            except Exception as e:
+                logger.warning(f"Attempt {attempt + 1} failed to fetch position {position_value}: {e}")
+                if attempt < self.retry_attempts - 1:
+                    time.sleep(2 ** attempt)
+        return None
+
+    def fetch_missing(self, position_values):
+        """Fetch every position not yet cached, in concurrent batches.
+        Returns how many positions were fetched, how many of them had parts and how many failed."""
+        fetched = found = failed = 0
+        pending = [value for value in position_values if value not in self.parts_cache]
+        logger.info(f"{len(position_values)} unique positions, {len(pending)} to fetch")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for start in range(0, len(pending), self.batch_size):
+                batch = pending[start:start + self.batch_size]
+                futures = {executor.submit(self.fetch_parts, value): value for value in batch}
+                for future in as_completed(futures):
+                    value = futures[future]
+                    parts = future.result()
+                    # Failed fetches and pages without parts (soft 404s, layout changes)
+                    # stay out of the cache so the next run retries them
+                    if parts is None:
+                        failed += 1
+                        continue
+                    fetched += 1
+                    if parts:
+                        self.parts_cache[value] = parts
+                        found += 1
+
+                self.save_cache()
+                logger.info(f"Fetched {fetched}/{len(pending)} positions ({found} with parts, {failed} failed)")
+                if start + self.batch_size < len(pending):
+                    time.sleep(random.uniform(self.min_delay, self.max_delay))
+        if fetched > found:
+            logger.warning(f"{fetched - found} positions returned no parts and will be retried next run")
+        if failed:
+            logger.warning(f"{failed} positions could not be fetched and will be retried next run")
+        return fetched, found, failed
+
+    def enrich_records(self, records):
+        """Join cached parts into the fitment records, one row per fitting part"""
+        enriched = []
+        for record in records:
+            parts = self.parts_cache.get(record.get('position_value')) or [{'product_name': '', 'part_number': ''}]
+            for part in parts:
+                row = dict(record)
+                row['product_name'] = part['product_name']
+                row['part_number'] = part['part_number']
+                enriched.append(row)
+        return enriched
+
+    def save_to_csv(self, records, filename=None):
+        """Save the enriched records to CSV file"""
+        if not records:
+            logger.warning("No enriched data to save")
+            return
+
+        filename = filename or self.output_file
+        try:
+            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=records[0].keys())
+                writer.writeheader()
+                writer.writerows(records)
+            logger.info(f"Saved {len(records)} enriched records to {filename}")
+        except Exception as e:
+            logger.error(f"Error saving enriched CSV: {e}")
+
+    def run(self, records):
+        """Run the enrichment stage over already scraped fitment records"""
+        logger.info("Starting bulb part-number enrichment...")
+        start_time = time.time()
+
+        if not self.results_url:
+            raise ValueError("No results URL set; pass the results page address with {position_value}")
+        if '{position_value}' not in self.results_url:
+            raise ValueError(f"Results URL {self.results_url} has no {{position_value}} placeholder")
+
+        self.load_cache()
+        # dict.fromkeys keeps first-seen order while removing duplicates
+        position_values = list(dict.fromkeys(r['position_value'] for r in records if r.get('position_value')))
+        try:
+            fetched, found, failed = self.fetch_missing(position_values)
+        except KeyboardInterrupt:
+            logger.info("Enrichment interrupted by user")
+            self.save_cache()
+            fetched = found = failed = 0
+
+        # Nothing reachable means the URL is wrong or the site is down; blank part numbers would hide it
+        if failed and not fetched:
+            raise RuntimeError(f"None of the {failed} pending positions could be fetched from {self.results_url}")
+        # Every page loading but none parsing means the URL or the page layout is wrong
+        if fetched and not found:
+            raise RuntimeError(f"None of the {fetched} fetched positions had any parts at {self.results_url}; "
+                               f"check the results URL and parse_results")
+
+        enriched = self.enrich_records(records)
+        self.save_to_csv(enriched)
+
+        logger.info(f"Enrichment completed in {time.time() - start_time:.2f} seconds")
+        return enriched
+
+
+def load_fitment_csv(filename):
+    """Load fitment records from a CSV written by the scraper"""
+    with open(filename, 'r', newline='', encoding='utf-8') as csvfile:
+        return list(csv.DictReader(csvfile))
+
+
+if __name__ == "__main__":
+    from scraper_logging import configure_logging
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python bulb_enrichment.py 'https://.../results?position={position_value}'")
+    configure_logging()
+    enricher = BulbPartEnricher(results_url=sys.argv[1])
+    enricher.run(load_fitment_csv("sylvania_fitment_data.csv"))
@@ -0,0 +1,249 @@
+"""
+Process watchdog for long Selenium runs.
+
+Tracks the chromedriver/Chrome process tree through /proc so the scraper can
+recycle the browser after a number of pages, a time limit or an RSS threshold,
+and cleans up zombie or orphaned browser processes left behind by crashes.
+Only browsers recorded in this tool's pidfile are ever treated as orphans.
+On systems without /proc the helpers report nothing and never kill anything.
+"""
+
+import json
+import os
+import signal
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROC_DIR = "/proc"
+BROWSER_NAMES = ("chrome", "chromedriver", "chromium", "chromium-browse")
+
+
+def read_stat(pid):
+    """Return (name, fields after the name) from /proc/<pid>/stat, or None if it is gone"""
+    try:
+        with open(f"{PROC_DIR}/{pid}/stat", 'r') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The name is wrapped in parentheses and may itself contain spaces
+    name = stat[stat.index('(') + 1:stat.rindex(')')]
+    return name, stat[stat.rindex(')') + 2:].split()
+
+
+def read_process(pid):
+    """Return (name, state, ppid) for a pid, or None if it is gone"""
+    stat = read_stat(pid)
+    if stat is None:
+        return None
+    name, fields = stat
+    return name, fields[0], int(fields[1])
+
+
+def process_identity(pid):
+    """Return (name, start time) of a running pid, or None if it is gone or a zombie.
+    A reused pid has a different start time, so the pair identifies one process."""
+    stat = read_stat(pid)
+    if stat is None or stat[1][0] == 'Z':
+        return None
+    name, fields = stat
+    return name, int(fields[19])
+
+
+def list_processes():
+    """Map pid -> (name, state, ppid) for every visible process"""
+    processes = {}
+    if not os.path.isdir(PROC_DIR):
+        return processes
+    for entry in os.listdir(PROC_DIR):
+        if entry.isdigit():
+            info = read_process(int(entry))
+            if info:
+                processes[int(entry)] = info
+    return processes
+
+
+def descendant_pids(root_pid, processes=None):
+    """All pids below root_pid, including root_pid itself if alive"""
+    processes = processes if processes is not None else list_processes()
+    children = {}
+    for pid, (_, _, ppid) in processes.items():
+        children.setdefault(ppid, []).append(pid)
+
+    found = [root_pid] if root_pid in processes else []
+    stack = list(found)
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def rss_mb(pids):
+    """Total resident memory of the given pids in megabytes"""
+    total_kb = 0
+    for pid in pids:
+        try:
+            with open(f"{PROC_DIR}/{pid}/status", 'r') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue
+    return total_kb / 1024
+
+
+def kill_pids(pids):
+    """SIGKILL every pid that is still alive, returning how many were signalled"""
+    killed = 0
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGKILL)
+            killed += 1
+        except (ProcessLookupError, PermissionError):
+            continue
+    return killed
+
+
+def snapshot_tree(root_pid):
+    """Map pid -> (name, start time) for the browser processes at and below root_pid"""
+    tree = {}
+    for pid in descendant_pids(root_pid):
+        identity = process_identity(pid)
+        if identity and identity[0].startswith(BROWSER_NAMES):
+            tree[pid] = identity
+    return tree
+
+
+def kill_survivors(tree):
+    """SIGKILL processes from a snapshot_tree() that are still running.
+    Each pid must still have the same name and start time, because an exited pid may have been reused."""
+    survivors = [pid for pid, identity in tree.items() if process_identity(pid) == tuple(identity)]
+    killed = kill_pids(survivors)
+    if killed:
+        logger.info(f"Killed {killed} browser processes that survived quit")
+    return killed
+
+
+def reap_zombies():
+    """Reap zombie children of this process, returning how many were collected"""
+    reaped = 0
+    own_pid = os.getpid()
+    for pid, (name, state, ppid) in list_processes().items():
+        if ppid == own_pid and state == 'Z':
+            try:
+                os.waitpid(pid, os.WNOHANG)
+                reaped += 1
+            except ChildProcessError:
+                continue
+    return reaped
+
+
+def write_pidfile(pidfile, root_pid):
+    """Record the browser processes this run started, and which process owns them"""
+    try:
+        owner = process_identity(os.getpid())
+        tmp_file = pidfile + ".tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump({
+                'owner': [os.getpid(), owner[1] if owner else None],
+                'browsers': {str(pid): list(identity) for pid, identity in snapshot_tree(root_pid).items()}
+            }, f)
+        os.replace(tmp_file, pidfile)
+    except Exception as e:
+        logger.error(f"Error writing browser pidfile: {e}")
+
+
+def remove_pidfile(pidfile):
+    try:
+        os.remove(pidfile)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f"Error removing browser pidfile: {e}")
+
+
+def cleanup_orphaned_browsers(pidfile):
+    """Kill browsers recorded in pidfile by an earlier run that never quit them.
+    Nothing is touched while the recording process is still running, and only
+    pids whose name and start time still match the record are killed."""
+    if not os.path.exists(pidfile):
+        return 0
+    try:
+        with open(pidfile, 'r') as f:
+            record = json.load(f)
+    except Exception as e:
+        logger.error(f"Error reading browser pidfile {pidfile}: {e}")
+        return 0
+
+    owner_pid, owner_start = record.get('owner', [None, None])
+    owner = process_identity(owner_pid) if owner_pid else None
+    if owner_pid != os.getpid() and owner and owner[1] == owner_start:
+        logger.info(f"Browsers in {pidfile} belong to running process {owner_pid}, leaving them alone")
+        return 0
+
+    processes = list_processes()
+    orphans = []
+    for pid, identity in record.get('browsers', {}).items():
+        if process_identity(int(pid)) == tuple(identity):
+            orphans.extend(descendant_pids(int(pid), processes))
+    killed = kill_pids(dict.fromkeys(orphans))
+    if killed:
+        logger.info(f"Killed {killed} orphaned browser processes")
+    remove_pidfile(pidfile)
+    return killed
+
+
+class DriverWatchdog:
+    """Decides when the current browser should be replaced by a fresh one"""
+
+    def __init__(self, max_pages=400, max_minutes=45, max_rss_mb=1500):
+        self.max_pages = max_pages
+        self.max_minutes = max_minutes
+        self.max_rss_mb = max_rss_mb
+        self.generation = 0
+        self.reset(None)
+
+    def reset(self, driver_pid):
+        """Start tracking a newly created driver"""
+        self.driver_pid = driver_pid
+        self.started = time.time()
+        self.pages = 0
+        self.timed_pages = 0
+        self.page_seconds = 0.0
+        if driver_pid:
+            self.generation += 1
+
+    def record_page(self, seconds=None):
+        """Count a page action; seconds is its option-load latency when measured"""
+        self.pages += 1
+        if seconds is not None:
+            self.timed_pages += 1
+            self.page_seconds += seconds
+
+    def average_latency(self):
+        return self.page_seconds / self.timed_pages if self.timed_pages else 0.0
+
+    def process_tree(self):
+        return descendant_pids(self.driver_pid) if self.driver_pid else []
+
+    def process_snapshot(self):
+        return snapshot_tree(self.driver_pid) if self.driver_pid else {}
+
+    def current_rss_mb(self):
+        return rss_mb(self.process_tree())
+
+    def should_recycle(self):
+        """Return the reason the browser should be recycled, or None"""
+        if self.max_pages and self.pages >= self.max_pages:
+            return f"{self.pages} pages"
+        minutes = (time.time() - self.started) / 60
+        if self.max_minutes and minutes >= self.max_minutes:
+            return f"{minutes:.0f} minutes"
+        if self.max_rss_mb:
+            memory = self.current_rss_mb()
+            if memory >= self.max_rss_mb:
+                return f"{memory:.0f} MB RSS"
+        return None
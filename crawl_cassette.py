@@ -0,0 +1,297 @@
+"""
+Record/replay cassettes for offline, deterministic crawls.
+
+In record mode the scraper stores every cascade response (year, make, model
+and position lists) with its observed load time in a gzipped JSON cassette
+indexed by the selected form values. In replay mode those responses are
+served either by a stand-in WebDriver (no browser, no network) or by a local
+HTTP page that real Chrome can drive, at a configurable speed.
+"""
+
+import gzip
+import json
+import os
+import re
+import threading
+import time
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import NoSuchElementException
+
+logger = logging.getLogger(__name__)
+
+SELECT_NAMES = ["bulbFinderYear", "bulbFinderMake", "bulbFinderModel", "bulbFinderPositions"]
+LEVEL_KEYS = ["years", "makes", "models", "positions"]
+PLACEHOLDER = ["", "Please Select"]
+
+
+def cassette_key(level, path=()):
+    """Index key of one cascade response, e.g. models/2025/3 for the 2025 Acura models"""
+    return "/".join([LEVEL_KEYS[level]] + [str(value) for value in path[:level]])
+
+
+class Cassette:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+
+    def record(self, key, options, seconds=0.0):
+        self.entries[key] = {
+            'options': [[opt['value'], opt['text']] for opt in options],
+            'latency': round(seconds, 3)
+        }
+
+    def get(self, key):
+        """Return (options, latency) for a key, or None if it was never recorded"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        return [{'value': value, 'text': text} for value, text in entry['options']], entry['latency']
+
+    def load(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        self.entries = data.get('entries', {})
+        logger.info(f"Loaded cassette {self.path} with {len(self.entries)} responses")
+        return self
+
+    def save(self):
+        try:
+            tmp_path = self.path + ".tmp"
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                json.dump({'version': 1, 'created': time.time(), 'entries': self.entries},
+                          f, separators=(',', ':'), sort_keys=True)
+            os.replace(tmp_path, self.path)
+            logger.debug(f"Saved cassette {self.path} with {len(self.entries)} responses")
+        except Exception as e:
+            logger.error(f"Error saving cassette: {e}")
+
+
+class ReplayPage:
+    """Cascade state shared by the stand-in select elements"""
+
+    def __init__(self, cassette, speed=0.0):
+        self.cassette = cassette
+        self.speed = speed
+        self.selects = [ReplaySelect(self, level) for level in range(len(SELECT_NAMES))]
+        self.reset()
+
+    def reset(self):
+        self.selected = [None] * len(SELECT_NAMES)
+        self.ready_at = [0.0] * len(SELECT_NAMES)
+
+    def delay(self, latency):
+        return latency / self.speed if self.speed else 0.0
+
+    def options(self, level):
+        """Options currently shown by a select, empty while its response is 'loading'"""
+        if any(value is None for value in self.selected[:level]) or time.time() < self.ready_at[level]:
+            return []
+        entry = self.cassette.get(cassette_key(level, self.selected))
+        return entry[0] if entry else []
+
+    def select(self, level, value):
+        self.selected[level] = value
+        for child in range(level + 1, len(SELECT_NAMES)):
+            self.selected[child] = None
+        if level + 1 < len(SELECT_NAMES):
+            entry = self.cassette.get(cassette_key(level + 1, self.selected))
+            self.ready_at[level + 1] = time.time() + self.delay(entry[1] if entry else 0.0)
+
+
+class ReplayOption:
+    def __init__(self, select, value, text):
+        self.select = select
+        self.value = value
+        self.text = text
+        self.tag_name = "option"
+
+    def get_attribute(self, name):
+        return self.value if name == 'value' else None
+
+    def get_dom_attribute(self, name):
+        return self.get_attribute(name)
+
+    def is_enabled(self):
+        return True
+
+    def is_selected(self):
+        return self.select.page.selected[self.select.level] == self.value and self.value != ""
+
+    def click(self):
+        if self.value:
+            self.select.page.select(self.select.level, self.value)
+
+
+class ReplaySelect:
+    """Just enough of a WebElement for Selenium's Select helper and the scraper"""
+
+    def __init__(self, page, level):
+        self.page = page
+        self.level = level
+        self.tag_name = "select"
+
+    def get_dom_attribute(self, name):
+        return None
+
+    def get_attribute(self, name):
+        return self.page.selected[self.level] if name == 'value' else None
+
+    def option_elements(self):
+        options = [PLACEHOLDER] + [[opt['value'], opt['text']] for opt in self.page.options(self.level)]
+        return [ReplayOption(self, value, text) for value, text in options]
+
+    def find_elements(self, by, value):
+        options = self.option_elements()
+        if by == By.TAG_NAME and value == "option":
+            return options
+        if by == By.CSS_SELECTOR:
+            # Select.select_by_value looks options up with option[value ="..."]
+            match = re.search(r'value\s*=\s*"(.*)"', value)
+            wanted = match.group(1) if match else None
+            return [opt for opt in options if opt.value == wanted]
+        return []
+
+
+class ReplayService:
+    process = None
+
+
+class ReplayDriver:
+    """Stand-in WebDriver that serves the bulb finder from a cassette"""
+
+    # Dependent lists are computed from the current selection and are never stale
+    resets_dependent_selects = True
+
+    def __init__(self, cassette, speed=0.0):
+        self.page = ReplayPage(cassette, speed)
+        self.service = ReplayService()
+
+    def get(self, url):
+        self.page.reset()
+
+    def refresh(self):
+        self.page.reset()
+
+    def find_element(self, by, value):
+        if by == By.NAME and value in SELECT_NAMES:
+            return self.page.selects[SELECT_NAMES.index(value)]
+        raise NoSuchElementException(f"No replay element {by}={value}")
+
+    def find_elements(self, by, value):
+        try:
+            return [self.find_element(by, value)]
+        except NoSuchElementException:
+            return []
+
+    def execute_script(self, script, *args):
+        # The only script with a result is the single round-trip option read
+        if args and isinstance(args[0], ReplaySelect):
+            return [[opt.value, opt.text] for opt in args[0].option_elements()]
+        return None
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def quit(self):
+        pass
+
+
+REPLAY_PAGE = """<!DOCTYPE html>
+<html><head><title>Bulb Finder Replay</title></head>
+<body>
+<form>%(selects)s</form>
+<script>
+var names = %(names)s;
+var years = %(years)s;
+function element(i) { return document.getElementsByName(names[i])[0]; }
+function fill(i, options) {
+  var select = element(i);
+  select.innerHTML = '<option value="">Please Select</option>';
+  options.forEach(function(o) { var e = document.createElement('option'); e.value = o[0]; e.text = o[1]; select.add(e); });
+}
+function load(i) {
+  var path = names.slice(0, i).map(function(n, j) { return element(j).value; }).join('/');
+  fetch('/options?level=' + i + '&path=' + encodeURIComponent(path))
+    .then(function(r) { return r.json(); })
+    .then(function(o) { fill(i, o); });
+}
+names.forEach(function(n, i) {
+  if (i + 1 < names.length) {
+    element(i).addEventListener('change', function() {
+      for (var j = i + 1; j < names.length; j++) { fill(j, []); }
+      load(i + 1);
+    });
+  }
+});
+fill(0, years);
+</script>
+</body></html>
+"""
+
+
+class CassetteServer:
+    """Local HTTP stand-in for the bulb finder, for replaying through real Chrome"""
+
+    def __init__(self, cassette, speed=0.0, host="127.0.0.1", port=0):
+        self.cassette = cassette
+        self.speed = speed
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def render_page(self):
+        entry = self.cassette.get(cassette_key(0))
+        years = [[opt['value'], opt['text']] for opt in entry[0]] if entry else []
+        selects = "".join(f'<select name="{name}"></select>' for name in SELECT_NAMES)
+        return REPLAY_PAGE % {'selects': selects, 'names': json.dumps(SELECT_NAMES), 'years': json.dumps(years)}
+
+    def make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/":
+                    self.respond("text/html", server.render_page())
+                elif url.path == "/options":
+                    query = parse_qs(url.query)
+                    level = int(query.get('level', ['0'])[0])
+                    path = [value for value in query.get('path', [''])[0].split('/') if value]
+                    entry = server.cassette.get(cassette_key(level, path))
+                    options, latency = entry if entry else ([], 0.0)
+                    if server.speed:
+                        time.sleep(latency / server.speed)
+                    self.respond("application/json", json.dumps([[opt['value'], opt['text']] for opt in options]))
+                else:
+                    self.send_error(404)
+
+            def respond(self, content_type, body):
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug("Replay server: " + format, *args)
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info(f"Replay server listening on {self.url}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,339 @@
+"""
+Planning pass for the Sylvania fitment crawl.
+
+Cheaply enumerates the year/make tree (and optionally the models), estimates
+the cost of every year/make subtree from previous runs and schedules the
+largest subtrees first across workers so they finish together. The same plan
+drives the live ETA shown while crawling.
+"""
+
+import csv
+import glob
+import heapq
+import json
+import os
+import time
+import logging
+from datetime import datetime, timedelta
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+
+from fitment_compaction import COMPACT_FIELDS, compact_records
+
+logger = logging.getLogger(__name__)
+
+
+def worker_file(filename, worker_index):
+    """Per-worker variant of a file name, e.g. data_w1.csv for data.csv"""
+    root, ext = os.path.splitext(filename)
+    return f"{root}_w{worker_index}{ext}"
+
+
+class CrawlHistory:
+    """Timings and tree sizes measured by earlier crawls"""
+
+    def __init__(self, history_file="crawl_history.json"):
+        self.history_file = history_file
+        # Parallel workers each save to their own file, merged on load
+        self.output_file = history_file
+        self.seconds_per_model = None
+        self.models_per_make = {}
+        # Weight of the newest measurement in the moving average
+        self.smoothing = 0.2
+
+    def worker_file(self, worker_index):
+        return worker_file(self.history_file, worker_index)
+
+    def load(self):
+        """Merge the main history with every worker's history, newest last"""
+        root, ext = os.path.splitext(self.history_file)
+        histories = []
+        for filename in [self.history_file] + glob.glob(f"{root}_w*{ext}"):
+            if not os.path.exists(filename):
+                continue
+            try:
+                with open(filename, 'r') as f:
+                    histories.append(json.load(f))
+            except Exception as e:
+                logger.error(f"Error loading crawl history {filename}: {e}")
+
+        speeds = []
+        for history in sorted(histories, key=lambda h: h.get('timestamp', 0)):
+            self.models_per_make.update(history.get('models_per_make', {}))
+            if history.get('seconds_per_model'):
+                speeds.append(history['seconds_per_model'])
+        if speeds:
+            self.seconds_per_model = sum(speeds) / len(speeds)
+        return self
+
+    def save(self):
+        """Write atomically so a concurrent load never sees a truncated file"""
+        try:
+            tmp_file = self.output_file + ".tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump({
+                    'seconds_per_model': self.seconds_per_model,
+                    'models_per_make': self.models_per_make,
+                    'timestamp': time.time()
+                }, f, indent=2)
+            os.replace(tmp_file, self.output_file)
+        except Exception as e:
+            logger.error(f"Error saving crawl history: {e}")
+
+    def record_make(self, make_value, model_count, seconds):
+        """Fold the measured time of one finished make into the history"""
+        self.models_per_make[make_value] = model_count
+        if model_count:
+            measured = seconds / model_count
+            if self.seconds_per_model is None:
+                self.seconds_per_model = measured
+            else:
+                self.seconds_per_model += self.smoothing * (measured - self.seconds_per_model)
+
+
+class CrawlPlanner:
+    def __init__(self, scraper, history=None, include_models=False):
+        self.scraper = scraper
+        self.history = history or CrawlHistory().load()
+        self.include_models = include_models
+        self.default_models_per_make = 10
+        self.reset_timeout = 5
+        # Dependent selects seen to be cleared synchronously when their parent changes
+        self.clears_on_change = set()
+
+    def select_and_wait_for_reset(self, select_element, value, child_name):
+        """Select a value and wait until the dependent select is cleared or replaced,
+        so options left over from the previous selection are never read as the new ones.
+        Returns the dependent select to read, or None if the selection failed."""
+        scraper = self.scraper
+        child = scraper.driver.find_element(By.NAME, child_name)
+        previous_options = scraper.read_option_list(child)[0]
+        if not scraper.select_option_by_value(select_element, value):
+            return None
+        if not previous_options:
+            return child
+
+        try:
+            options, raw_count = scraper.read_option_list(child)
+        except StaleElementReferenceException:
+            return scraper.driver.find_element(By.NAME, child_name)
+        if raw_count < 2:
+            # Cleared by the change handler itself, so from now on whatever list
+            # is showing right after a selection belongs to that selection
+            self.clears_on_change.add(child_name)
+            return child
+        # An identical list is then the reloaded one, which is normal for consecutive years
+        if options != previous_options or child_name in self.clears_on_change:
+            return child
+
+        def reset(driver):
+            try:
+                options, raw_count = scraper.read_option_list(child)
+            except StaleElementReferenceException:
+                return True
+            return raw_count < 2 or options != previous_options
+
+        try:
+            WebDriverWait(scraper.driver, self.reset_timeout, poll_frequency=0.2).until(reset)
+        except TimeoutException:
+            # Either both selections share the same list or the site never cleared it;
+            # give the request the same settling delay the crawl loop uses
+            scraper.random_delay()
+        return scraper.driver.find_element(By.NAME, child_name)
+
+    def enumerate_tree(self):
+        """Walk years and makes (and models if requested) without visiting positions"""
+        scraper = self.scraper
+        subtrees = []
+        if not scraper.setup_selenium_driver():
+            logger.error("Failed to setup driver for planning")
+            return subtrees
+
+        # A replay driver derives every list from the current selection, so none can be stale
+        if getattr(scraper.driver, 'resets_dependent_selects', False):
+            self.clears_on_change.update(["bulbFinderMake", "bulbFinderModel"])
+
+        try:
+            scraper.driver.get(scraper.base_url)
+            WebDriverWait(scraper.driver, 20).until(EC.presence_of_element_located((By.NAME, "bulbFinderYear")))
+
+            year_select = scraper.driver.find_element(By.NAME, "bulbFinderYear")
+            year_options = [opt for opt in scraper.get_select_options(year_select)
+                            if opt['text'].isdigit() and int(opt['text']) in scraper.target_years]
+
+            for year_option in year_options:
+                make_select = self.select_and_wait_for_reset(year_select, year_option['value'], "bulbFinderMake")
+                if make_select is None:
+                    continue
+                make_options = scraper.load_child_options(make_select, "makes") or []
+                logger.info(f"Planning year {year_option['text']}: {len(make_options)} makes")
+
+                for make_option in make_options:
+                    models = None
+                    model_select = None
+                    if self.include_models:
+                        model_select = self.select_and_wait_for_reset(make_select, make_option['value'],
+                                                                      "bulbFinderModel")
+                    if model_select is not None:
+                        model_options = scraper.load_child_options(model_select, f"models:{make_option['value']}")
+                        models = len(model_options) if model_options is not None else None
+
+                    subtrees.append({
+                        'year': year_option['text'],
+                        'year_value': year_option['value'],
+                        'make': make_option['text'],
+                        'make_value': make_option['value'],
+                        'models': models
+                    })
+        except Exception as e:
+            logger.error(f"Error during planning: {e}")
+        finally:
+            scraper.quit_driver()
+        return subtrees
+
+    def estimate_costs(self, subtrees):
+        """Attach an estimated duration in seconds to every subtree"""
+        average_delay = (self.scraper.min_delay + self.scraper.max_delay) / 2
+        if self.history.seconds_per_model:
+            # Measured from whole makes, so the per-make overhead is already included
+            seconds_per_model = self.history.seconds_per_model
+            make_overhead = 0
+        else:
+            # Two random delays per model plus the extra one, and a rough page overhead
+            seconds_per_model = 2 * average_delay + self.scraper.model_delay + 2
+            make_overhead = 2 * average_delay + 5
+
+        known_counts = list(self.history.models_per_make.values())
+        fallback_models = (sum(known_counts) / len(known_counts)) if known_counts else self.default_models_per_make
+
+        for subtree in subtrees:
+            models = subtree['models']
+            if models is None:
+                cached = self.scraper.option_cache.get(f"models:{subtree['make_value']}")
+                models = self.history.models_per_make.get(subtree['make_value'],
+                                                          len(cached) if cached else fallback_models)
+            subtree['cost'] = models * seconds_per_model + make_overhead
+        return subtrees
+
+    def schedule(self, subtrees, workers=1):
+        """Longest-processing-time-first assignment of subtrees to workers"""
+        assignments = [{'worker': i, 'cost': 0.0, 'subtrees': []} for i in range(workers)]
+        loads = [(0.0, i) for i in range(workers)]
+        heapq.heapify(loads)
+
+        for subtree in sorted(subtrees, key=lambda s: s['cost'], reverse=True):
+            load, worker = heapq.heappop(loads)
+            assignments[worker]['subtrees'].append(subtree)
+            assignments[worker]['cost'] = load + subtree['cost']
+            heapq.heappush(loads, (load + subtree['cost'], worker))
+        return assignments
+
+    def build_plan(self, workers=1):
+        """Enumerate, estimate and schedule in one go"""
+        subtrees = self.estimate_costs(self.enumerate_tree())
+        return {
+            'created': time.time(),
+            'total_cost': sum(s['cost'] for s in subtrees),
+            'workers': self.schedule(subtrees, workers)
+        }
+
+
+def save_plan(plan, filename):
+    with open(filename, 'w') as f:
+        json.dump(plan, f, indent=2)
+
+
+def load_plan(filename):
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+def merge_worker_outputs(output_file, worker_count, compact=False):
+    """Combine the per-year CSVs of every worker of a plan into output_file.
+    Rows are deduplicated and ordered newest year first like a single crawl,
+    so compaction sees each vehicle's years in sequence even when the plan
+    split them across workers. Returns the number of rows written."""
+    worker_files = [worker_file(output_file, i) for i in range(worker_count)]
+    missing = [filename for filename in worker_files if not os.path.exists(filename)]
+    if missing:
+        raise FileNotFoundError(f"Worker output missing: {', '.join(missing)}")
+
+    records = []
+    seen = set()
+    fieldnames = None
+    for filename in worker_files:
+        with open(filename, 'r', newline='', encoding='utf-8') as csvfile:
+            reader = csv.DictReader(csvfile)
+            if 'year' not in (reader.fieldnames or []):
+                raise ValueError(f"{filename} has no year column; merge per-year worker output, then compact")
+            fieldnames = fieldnames or reader.fieldnames
+            for record in reader:
+                record_tuple = tuple(sorted(record.items()))
+                if record_tuple not in seen:
+                    seen.add(record_tuple)
+                    records.append(record)
+        logger.info(f"Read {filename}")
+
+    # Stable sort keeps each worker's make/model order within a year
+    records.sort(key=lambda record: int(record['year']), reverse=True)
+    if compact:
+        records = list(compact_records(records))
+        fieldnames = COMPACT_FIELDS
+
+    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(records)
+    logger.info(f"Merged {worker_count} workers into {len(records)} rows in {output_file}")
+    return len(records)
+
+
+def format_duration(seconds):
+    return str(timedelta(seconds=int(seconds)))
+
+
+def format_plan_summary(plan):
+    """Human readable summary of a plan for --plan-only"""
+    subtree_count = sum(len(w['subtrees']) for w in plan['workers'])
+    makespan = max((w['cost'] for w in plan['workers']), default=0)
+    finish = datetime.now() + timedelta(seconds=makespan)
+
+    lines = [
+        f"Subtrees (year/make): {subtree_count}",
+        f"Estimated total work: {format_duration(plan['total_cost'])}",
+    ]
+    for worker in plan['workers']:
+        largest = ", ".join(f"{s['year']} {s['make']}" for s in worker['subtrees'][:3])
+        lines.append(f"  Worker {worker['worker']}: {len(worker['subtrees'])} subtrees, "
+                     f"{format_duration(worker['cost'])} (largest: {largest})")
+    lines.append(f"Projected finish: {finish:%Y-%m-%d %H:%M} ({format_duration(makespan)} wall time)")
+    return "\n".join(lines)
+
+
+class EtaTracker:
+    """Projects the finish time from planned costs and the pace observed so far"""
+
+    def __init__(self, subtrees):
+        self.costs = {(s['year'], s['make']): s['cost'] for s in subtrees}
+        self.total_cost = sum(self.costs.values())
+        self.done_cost = 0.0
+        self.start_time = time.time()
+
+    def complete(self, year, make):
+        self.done_cost += self.costs.pop((year, make), 0.0)
+
+    def skip(self, year, make):
+        """Drop a subtree finished by an earlier session so it does not skew the pace"""
+        self.total_cost -= self.costs.pop((year, make), 0.0)
+
+    def status(self):
+        if not self.done_cost:
+            return f"0% of planned {format_duration(self.total_cost)}"
+        elapsed = time.time() - self.start_time
+        remaining = (self.total_cost - self.done_cost) * elapsed / self.done_cost
+        finish = datetime.now() + timedelta(seconds=remaining)
+        return (f"{100 * self.done_cost / self.total_cost:.0f}% done, "
+                f"ETA {finish:%Y-%m-%d %H:%M} ({format_duration(remaining)} left)")
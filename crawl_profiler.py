@@ -0,0 +1,211 @@
+"""
+CPU and memory profiling for crawl runs.
+
+Wraps a run with cProfile for exact call counts and a wall-clock stack
+sampler for a flamegraph-compatible folded stack dump. The samples are split
+into time spent in our own code, in WebDriver round-trips and in deliberate
+sleeps. tracemalloc snapshots are taken at every progress checkpoint and the
+allocation growth between them is reported; both profilers are paused while a
+snapshot is taken so its cost is reported on its own.
+"""
+
+import cProfile
+import linecache
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Frames from these packages mean the crawl is waiting on the browser
+WEBDRIVER_PACKAGES = (os.sep + "selenium" + os.sep, os.sep + "urllib3" + os.sep, os.sep + "http" + os.sep + "client.py")
+
+
+def frame_label(code):
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}"
+
+
+def is_sleep_line(filename, lineno):
+    return 'sleep(' in linecache.getline(filename, lineno)
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.categories = Counter()
+        self.samples = 0
+        self.paused = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if self.paused:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.record(frame)
+
+    def record(self, frame):
+        leaf_file, leaf_line = frame.f_code.co_filename, frame.f_lineno
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+
+        self.samples += 1
+        self.stacks[";".join(frame_label(code) for code in codes)] += 1
+        self.categories[self.categorize(codes, leaf_file, leaf_line)] += 1
+
+    def categorize(self, codes, leaf_file, leaf_line):
+        filenames = [code.co_filename for code in codes]
+        if any(package in filename for filename in filenames for package in WEBDRIVER_PACKAGES):
+            return "webdriver"
+        if is_sleep_line(leaf_file, leaf_line):
+            return "sleep"
+        # Library calls made from our code (json.dump in save_progress, csv writing) count as ours
+        if any(filename.startswith(PROJECT_DIR) for filename in filenames):
+            return "own code"
+        return "other"
+
+    def inclusive_counts(self):
+        """Samples per function, counting a function once per stack it appears in"""
+        counts = Counter()
+        for stack, count in self.stacks.items():
+            for label in set(stack.split(";")):
+                counts[label] += count
+        return counts
+
+
+class CrawlProfiler:
+    def __init__(self, output_prefix="crawl_profile", sample_interval=0.005, top_allocations=15):
+        self.output_prefix = output_prefix
+        self.sample_interval = sample_interval
+        self.top_allocations = top_allocations
+        self.profile = cProfile.Profile()
+        self.sampler = None
+        self.checkpoints = []
+        self._last_snapshot = None
+        self._profiling = False
+        self.wall_seconds = 0.0
+        self.snapshot_count = 0
+        self.snapshot_seconds = 0.0
+
+    def checkpoint(self, label):
+        """Take a tracemalloc snapshot and keep the growth since the previous one"""
+        if not tracemalloc.is_tracing():
+            return
+        # Keep the snapshot out of the samples and cProfile so it cannot inflate save_progress
+        paused = self._profiling
+        if paused:
+            self.profile.disable()
+            self.sampler.paused = True
+        started = time.perf_counter()
+        try:
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, linecache.__file__),
+            ])
+            current, peak = tracemalloc.get_traced_memory()
+            growth = []
+            if self._last_snapshot is not None:
+                growth = [str(stat) for stat in snapshot.compare_to(self._last_snapshot, 'lineno')[:5]]
+            self.checkpoints.append({'label': label, 'current': current, 'peak': peak, 'growth': growth})
+            self._last_snapshot = snapshot
+        finally:
+            self.snapshot_count += 1
+            self.snapshot_seconds += time.perf_counter() - started
+            if paused:
+                self.sampler.paused = False
+                self.profile.enable()
+
+    def run(self, func, *args, **kwargs):
+        """Run func under the profilers and write the reports afterwards"""
+        tracemalloc.start()
+        self.sampler = StackSampler(threading.get_ident(), self.sample_interval)
+        self.sampler.start()
+        start_time = time.time()
+        self._profiling = True
+        self.profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.profile.disable()
+            self._profiling = False
+            self.wall_seconds = time.time() - start_time
+            self.sampler.stop()
+            self.checkpoint("end of run")
+            tracemalloc.stop()
+            self.write_reports()
+
+    def write_reports(self):
+        try:
+            self.profile.dump_stats(f"{self.output_prefix}.pstats")
+            with open(f"{self.output_prefix}.folded", 'w') as f:
+                for stack, count in self.sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            with open(f"{self.output_prefix}_report.txt", 'w') as f:
+                f.write(self.format_report())
+            logger.info(f"Profile written to {self.output_prefix}.pstats, {self.output_prefix}.folded "
+                        f"and {self.output_prefix}_report.txt")
+        except Exception as e:
+            logger.error(f"Error writing profile reports: {e}")
+
+    def format_report(self):
+        samples = self.sampler.samples or 1
+        sampled_seconds = self.wall_seconds - self.snapshot_seconds
+        lines = [f"Wall time: {self.wall_seconds:.1f}s, {self.sampler.samples} stack samples",
+                 f"tracemalloc snapshots: {self.snapshot_count} in {self.snapshot_seconds:.1f}s "
+                 f"(excluded from samples and cProfile)", "",
+                 "Time breakdown (share of samples):"]
+        for category in ("own code", "webdriver", "sleep", "other"):
+            share = self.sampler.categories[category] / samples
+            lines.append(f"  {category:<10} {100 * share:5.1f}%  ~{share * sampled_seconds:.1f}s")
+
+        lines += ["", "Hottest project functions (inclusive):"]
+        project_modules = {os.path.splitext(name)[0] for name in os.listdir(PROJECT_DIR) if name.endswith('.py')}
+        project_modules.discard(os.path.splitext(os.path.basename(__file__))[0])
+        hottest = [(label, count) for label, count in self.sampler.inclusive_counts().most_common()
+                   if label.split(':')[0] in project_modules]
+        for label, count in hottest[:15]:
+            lines.append(f"  {100 * count / samples:5.1f}%  {label}")
+
+        lines += ["", f"Top {self.top_allocations} allocations at end of run:"]
+        if self._last_snapshot is not None:
+            for stat in self._last_snapshot.statistics('lineno')[:self.top_allocations]:
+                lines.append(f"  {stat}")
+
+        lines += ["", "Memory at checkpoints:"]
+        for checkpoint in self.checkpoints:
+            lines.append(f"  {checkpoint['label']}: {checkpoint['current'] / 1024:.0f} KiB "
+                         f"(peak {checkpoint['peak'] / 1024:.0f} KiB)")
+
+        # Long runs checkpoint after every model, so only detail the biggest jumps
+        jumps = sorted(zip(self.checkpoints[1:], self.checkpoints),
+                       key=lambda pair: pair[0]['current'] - pair[1]['current'], reverse=True)
+        lines += ["", "Largest growth between checkpoints:"]
+        for checkpoint, previous in jumps[:10]:
+            lines.append(f"  {checkpoint['label']}: +{(checkpoint['current'] - previous['current']) / 1024:.0f} KiB")
+            for growth in checkpoint['growth']:
+                lines.append(f"      {growth}")
+        return "\n".join(lines) + "\n"
@@ -16,11 +16,18 @@ from webdriver_manager.chrome import ChromeDriverManager
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 # import pandas as pd  # Comment out to avoid dependency issues
 import logging
+from crawl_planner import CrawlHistory, EtaTracker
+from chrome_watchdog import (DriverWatchdog, cleanup_orphaned_browsers, kill_survivors, reap_zombies,
+                             write_pidfile, remove_pidfile)
+from scraper_logging import configure_logging, ProgressLine
+from crawl_cassette import cassette_key
+from fitment_compaction import compact_records
 
-# Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Reads every option of a select in a single WebDriver round-trip
+OPTION_LIST_SCRIPT = "return Array.from(arguments[0].options).map(function(o) { return [o.value, o.text.trim()]; });"
+
 class EnhancedSylvaniaFitmentScraper:
     def __init__(self, use_proxy=False, proxy_list=None, headless=True):
         self.base_url = "https://www.sylvania-automotive.com/"
@@ -34,6 +41,7 @@ class EnhancedSylvaniaFitmentScraper:
         # Rate limiting settings
         self.min_delay = 3  # Increased minimum delay
         self.max_delay = 7  # Increased maximum delay
+        self.model_delay = 1  # Extra delay between models
         self.retry_attempts = 3
         
         # Target years
@@ -42,6 +50,41 @@ class EnhancedSylvaniaFitmentScraper:
         # Progress tracking
         self.progress_file = "scraping_progress.json"
         self.output_file = "sylvania_fitment_data.csv"
+        # Replay runs start fresh and keep their timings out of the crawl history
+        self.resume = True
+        self.record_history = True
+        # Write year_start/year_end ranges instead of one row per year
+        self.compact_output = False
+        
+        # Child option lists memoized across years by stable form values
+        self.option_cache = {}
+        self.cache_confirm_timeout = 5
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        # Planning: measured history, this worker's share of the plan and live ETA
+        self.history = CrawlHistory().load()
+        self.assigned_subtrees = None
+        self.eta = None
+        
+        # Browser recycling after N pages, M minutes or an RSS threshold
+        self.watchdog = DriverWatchdog(max_pages=400, max_minutes=45, max_rss_mb=1500)
+        # Browsers started by this run, so a later run only cleans up its own leftovers
+        self.browser_pidfile = "browser_pids.json"
+        self.last_processed = {}
+        
+        # Per-record logging is sampled debug output; progress goes to one throttled line
+        self.log_sample_every = 100
+        self.records_added = 0
+        self.progress_line = None
+        
+        # Record mode stores every cascade response in this cassette;
+        # replay swaps the browser for driver_factory() or points base_url at a stand-in
+        self.cassette = None
+        self.driver_factory = None
+        
+        # Optional CrawlProfiler that snapshots memory at every checkpoint
+        self.profiler = None
         
     def load_progress(self):
         """Load previous scraping progress if exists"""
@@ -50,6 +93,7 @@ class EnhancedSylvaniaFitmentScraper:
                 with open(self.progress_file, 'r') as f:
                     progress = json.load(f)
                     self.fitment_data = progress.get('fitment_data', [])
+                    self.option_cache = progress.get('option_cache', {})
                     logger.info(f"Loaded {len(self.fitment_data)} records from previous session")
                     return progress.get('last_processed', {})
             except Exception as e:
@@ -58,10 +102,12 @@ class EnhancedSylvaniaFitmentScraper:
         
     def save_progress(self, last_processed=None):
         """Save current progress"""
+        self.last_processed = last_processed or {}
         try:
             progress = {
                 'fitment_data': self.fitment_data,
                 'last_processed': last_processed or {},
+                'option_cache': self.option_cache,
                 'timestamp': time.time()
             }
             with open(self.progress_file, 'w') as f:
@@ -69,11 +115,28 @@ class EnhancedSylvaniaFitmentScraper:
                 
             # Also save CSV as backup
             self.save_to_csv()
+            # Keep the recording in step with the progress it resumes from
+            if self.cassette:
+                self.cassette.save()
         except Exception as e:
             logger.error(f"Error saving progress: {e}")
+            
+        if self.profiler:
+            self.profiler.checkpoint(" ".join(self.last_processed.values()) or "checkpoint")
+        
+    def set_plan(self, plan, worker_index=0):
+        """Restrict the crawl to one worker's subtrees of a plan and track its ETA"""
+        subtrees = plan['workers'][worker_index]['subtrees']
+        self.assigned_subtrees = {(s['year'], s['make']) for s in subtrees}
+        self.eta = EtaTracker(subtrees)
         
     def setup_selenium_driver(self):
         """Set up Selenium WebDriver with proper options and optional proxy"""
+        if self.driver_factory:
+            self.driver = self.driver_factory()
+            self.watchdog.reset(None)
+            return True
+            
         chrome_options = Options()
         
         if self.headless:
@@ -109,11 +172,47 @@ class EnhancedSylvaniaFitmentScraper:
             # Set page load timeout
             self.driver.set_page_load_timeout(30)
             
+            self.watchdog.reset(self.driver.service.process.pid)
+            write_pidfile(self.browser_pidfile, self.watchdog.driver_pid)
             return True
         except Exception as e:
             logger.error(f"Error setting up driver: {e}")
             return False
             
+    def quit_driver(self):
+        """Quit the browser and make sure none of its processes outlive it"""
+        if not self.driver:
+            return
+        process_tree = self.watchdog.process_snapshot()
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error quitting driver: {e}")
+        self.driver = None
+        reap_zombies()
+        kill_survivors(process_tree)
+        reap_zombies()
+        if self.watchdog.driver_pid:
+            remove_pidfile(self.browser_pidfile)
+        
+    def recycle_driver(self, reason):
+        """Replace the browser with a fresh one, handing state off through the checkpoint"""
+        logger.info(f"Recycling browser after {reason} "
+                    f"(generation {self.watchdog.generation}, {self.watchdog.pages} pages, "
+                    f"{self.watchdog.average_latency():.2f}s avg option-load latency)")
+        self.save_progress(self.last_processed)
+        self.quit_driver()
+        if not self.setup_selenium_driver():
+            return False
+        try:
+            self.driver.get(self.base_url)
+            wait = WebDriverWait(self.driver, 20)
+            wait.until(EC.presence_of_element_located((By.NAME, "bulbFinderYear")))
+            return True
+        except Exception as e:
+            logger.error(f"Error loading page in new browser: {e}")
+            return False
+            
     def wait_for_options_to_load(self, select_element, min_options=2, timeout=15):
         """Wait for select element to be populated with options"""
         try:
@@ -143,6 +242,54 @@ class EnhancedSylvaniaFitmentScraper:
             logger.error(f"Error getting select options: {e}")
         return options
         
+    def read_option_list(self, select_element):
+        """Read all options of a select with one script call, same filtering as get_select_options"""
+        raw_options = self.driver.execute_script(OPTION_LIST_SCRIPT, select_element) or []
+        options = [{'value': value, 'text': text} for value, text in raw_options
+                   if value and text != "Please Select"]
+        return options, len(raw_options)
+        
+    def confirm_cached_options(self, select_element, cached_options, min_options=2):
+        """Check that a dependent select loaded exactly the cached options.
+        Returns as soon as the list is populated, so a stale cache costs one poll."""
+        def check(driver):
+            options, raw_count = self.read_option_list(select_element)
+            if raw_count < min_options:
+                return False
+            return 'match' if options == cached_options else 'mismatch'
+            
+        try:
+            wait = WebDriverWait(self.driver, self.cache_confirm_timeout, poll_frequency=0.2)
+            return wait.until(check) == 'match'
+        except TimeoutException:
+            return False
+        except WebDriverException as e:
+            logger.warning(f"Cached option check failed: {e}")
+            return False
+            
+    def load_child_options(self, select_element, cache_key, record_key=None):
+        """Return the options of a dependent select, reusing the list memoized in
+        earlier years when the page confirms it is unchanged"""
+        started = time.time()
+        cached = self.option_cache.get(cache_key)
+        if cached and self.confirm_cached_options(select_element, cached):
+            self.cache_hits += 1
+            options = cached
+        else:
+            self.cache_misses += 1
+            if not self.wait_for_options_to_load(select_element):
+                self.watchdog.record_page(time.time() - started)
+                return None
+            options = self.get_select_options(select_element)
+            if options:
+                self.option_cache[cache_key] = options
+                
+        # The wait for the dependent list is the page latency that grows as Chrome ages
+        self.watchdog.record_page(time.time() - started)
+        if self.cassette and record_key:
+            self.cassette.record(record_key, options, time.time() - started)
+        return options
+        
     def select_option_by_value(self, select_element, value):
         """Select an option by its value with retry logic"""
         for attempt in range(self.retry_attempts):
@@ -162,6 +309,7 @@ class EnhancedSylvaniaFitmentScraper:
             self.driver.refresh()
             wait = WebDriverWait(self.driver, 20)
             wait.until(EC.presence_of_element_located((By.NAME, "bulbFinderYear")))
+            self.watchdog.record_page()
             return True
         except Exception as e:
             logger.error(f"Error refreshing page: {e}")
@@ -169,9 +317,18 @@ class EnhancedSylvaniaFitmentScraper:
             
     def scrape_fitment_data(self):
         """Main method to scrape fitment data with resume capability"""
-        last_processed = self.load_progress()
+        last_processed = self.load_progress() if self.resume else {}
+        self.progress_line = ProgressLine()
+        
+        if self.eta:
+            finished = {(r['year'], r['make']) for r in self.fitment_data}
+            finished.discard((last_processed.get('year'), last_processed.get('make')))
+            for year, make in finished:
+                self.eta.skip(year, make)
+            logger.info(f"Plan: {self.eta.status()}")
         
         try:
+            cleanup_orphaned_browsers(self.browser_pidfile)
             logger.info("Setting up Selenium driver...")
             if not self.setup_selenium_driver():
                 logger.error("Failed to setup driver")
@@ -189,6 +346,8 @@ class EnhancedSylvaniaFitmentScraper:
             # Get year select element
             year_select = self.driver.find_element(By.NAME, "bulbFinderYear")
             year_options = self.get_select_options(year_select)
+            if self.cassette:
+                self.cassette.record(cassette_key(0), year_options)
             
             # Filter for target years only
             target_year_options = [opt for opt in year_options if opt['text'].isdigit() and int(opt['text']) in self.target_years]
@@ -223,11 +382,11 @@ class EnhancedSylvaniaFitmentScraper:
                     logger.error("Make select element not found")
                     continue
                     
-                if not self.wait_for_options_to_load(make_select):
+                make_options = self.load_child_options(make_select, "makes", cassette_key(1, [year_value]))
+                if make_options is None:
                     logger.warning(f"Make options didn't load for year {year_text}")
                     continue
                     
-                make_options = self.get_select_options(make_select)
                 logger.info(f"Found {len(make_options)} makes for year {year_text}")
                 
                 # Resume from last processed make if same year
@@ -242,7 +401,11 @@ class EnhancedSylvaniaFitmentScraper:
                     make_text = make_option['text']
                     make_value = make_option['value']
                     
+                    if self.assigned_subtrees is not None and (year_text, make_text) not in self.assigned_subtrees:
+                        continue
+                        
                     logger.info(f"  Processing make: {make_text} ({make_idx + 1}/{len(make_options)})")
+                    make_start_time = time.time()
                     
                     # Select make
                     if not self.select_option_by_value(make_select, make_value):
@@ -258,18 +421,23 @@ class EnhancedSylvaniaFitmentScraper:
                         logger.error("Model select element not found")
                         continue
                         
-                    if not self.wait_for_options_to_load(model_select):
+                    if f"models:{make_value}" in self.option_cache:
+                        expected = len(self.option_cache[f"models:{make_value}"])
+                        logger.info(f"    Expecting {expected} models for {make_text} from earlier years")
+                        
+                    model_options = self.load_child_options(model_select, f"models:{make_value}",
+                                                            cassette_key(2, [year_value, make_value]))
+                    if model_options is None:
                         logger.warning(f"Model options didn't load for {year_text} {make_text}")
                         continue
                         
-                    model_options = self.get_select_options(model_select)
                     logger.info(f"    Found {len(model_options)} models for {year_text} {make_text}")
                     
                     for model_idx, model_option in enumerate(model_options):
                         model_text = model_option['text']
                         model_value = model_option['value']
                         
-                        logger.info(f"    Processing model: {model_text} ({model_idx + 1}/{len(model_options)})")
+                        logger.debug("    Processing model: %s (%d/%d)", model_text, model_idx + 1, len(model_options))
                         
                         # Select model
                         if not self.select_option_by_value(model_select, model_value):
@@ -285,12 +453,13 @@ class EnhancedSylvaniaFitmentScraper:
                             logger.error("Position select element not found")
                             continue
                             
-                        if not self.wait_for_options_to_load(position_select):
+                        position_options = self.load_child_options(position_select, f"positions:{make_value}:{model_value}",
+                                                                   cassette_key(3, [year_value, make_value, model_value]))
+                        if position_options is None:
                             logger.warning(f"Position options didn't load for {year_text} {make_text} {model_text}")
                             continue
                             
-                        position_options = self.get_select_options(position_select)
-                        logger.info(f"      Found {len(position_options)} positions for {year_text} {make_text} {model_text}")
+                        logger.debug("      Found %d positions for %s %s %s", len(position_options), year_text, make_text, model_text)
                         
                         for position_option in position_options:
                             position_text = position_option['text']
@@ -309,7 +478,11 @@ class EnhancedSylvaniaFitmentScraper:
                             }
                             
                             self.fitment_data.append(fitment_record)
-                            logger.info(f"      Added: {year_text} {make_text} {model_text} - {position_text}")
+                            self.records_added += 1
+                            if self.records_added % self.log_sample_every == 0:
+                                logger.debug("      Added: %s %s %s - %s", year_text, make_text, model_text, position_text)
+                        
+                        self.progress_line.update(len(position_options), f"{year_text} {make_text} {model_text}")
                         
                         # Save progress after each model
                         current_progress = {
@@ -320,11 +493,23 @@ class EnhancedSylvaniaFitmentScraper:
                         self.save_progress(current_progress)
                         
                         # Add extra delay between models
-                        self.random_delay(1)
+                        self.random_delay(self.model_delay)
+                    
+                    self.history.record_make(make_value, len(model_options), time.time() - make_start_time)
+                    if self.record_history:
+                        self.history.save()
+                    if self.eta:
+                        self.eta.complete(year_text, make_text)
+                        logger.info(f"  Completed make {make_text}: {self.eta.status()}")
                     
                     # Refresh page and re-navigate for next make
                     if make_idx < len(make_options) - 1:  # Don't refresh on last make
-                        if not self.refresh_page_and_navigate_to_form():
+                        recycle_reason = self.watchdog.should_recycle()
+                        if recycle_reason:
+                            if not self.recycle_driver(recycle_reason):
+                                logger.error("Failed to recycle browser")
+                                break
+                        elif not self.refresh_page_and_navigate_to_form():
                             logger.error("Failed to refresh page")
                             break
                             
@@ -335,7 +520,9 @@ class EnhancedSylvaniaFitmentScraper:
                         self.random_delay()
                         
                         make_select = self.driver.find_element(By.NAME, "bulbFinderMake")
-                        if not self.wait_for_options_to_load(make_select):
+                        # The make list for this year is already known, so a single confirm is enough
+                        if not (self.confirm_cached_options(make_select, make_options)
+                                or self.wait_for_options_to_load(make_select)):
                             break
                 
                 logger.info(f"Completed year {year_text}")
@@ -345,8 +532,11 @@ class EnhancedSylvaniaFitmentScraper:
         except Exception as e:
             logger.error(f"Error during scraping: {e}")
         finally:
-            if self.driver:
-                self.driver.quit()
+            self.progress_line.close()
+            self.quit_driver()
+            if self.cassette:
+                self.cassette.save()
+                logger.info(f"Saved cassette {self.cassette.path} with {len(self.cassette.entries)} responses")
                 
     def save_to_csv(self, filename=None):
         """Save the scraped data to CSV file"""
@@ -365,6 +555,9 @@ class EnhancedSylvaniaFitmentScraper:
                     seen.add(record_tuple)
                     unique_data.append(record)
             
+            if self.compact_output:
+                unique_data = list(compact_records(unique_data))
+            
             # Write to CSV manually
             if unique_data:
                 fieldnames = unique_data[0].keys()
@@ -402,8 +595,11 @@ class EnhancedSylvaniaFitmentScraper:
         end_time = time.time()
         logger.info(f"Scraping completed in {end_time - start_time:.2f} seconds")
         logger.info(f"Total records collected: {len(self.fitment_data)}")
+        logger.info(f"Option cache: {self.cache_hits} confirmed hits, {self.cache_misses} full loads")
 
 if __name__ == "__main__":
+    configure_logging()
+    
     # Example proxy list (you can add your own proxies here)
     proxy_list = [
         # "http://proxy1:port",
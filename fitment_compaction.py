@@ -0,0 +1,98 @@
+"""
+Run-length year-range compaction of the fitment output.
+
+Collapses rows that are identical apart from the year over consecutive years
+into one row with `year_start`/`year_end`, and expands them back into the
+per-year rows the scraper writes. Both directions stream through the data in
+a single pass; compaction only keeps one open range per vehicle position.
+The form value of a year is its text on the Sylvania site, so `year_value`
+is dropped when compacting and rebuilt from the year when expanding.
+"""
+
+import csv
+import sys
+import argparse
+
+FITMENT_FIELDS = ['year', 'make', 'model', 'bulb_position', 'year_value', 'make_value', 'model_value', 'position_value']
+RANGE_KEY_FIELDS = ['make', 'model', 'bulb_position', 'make_value', 'model_value', 'position_value']
+COMPACT_FIELDS = ['year_start', 'year_end'] + RANGE_KEY_FIELDS
+
+
+def _range_row(key, year_start, year_end):
+    row = {'year_start': str(year_start), 'year_end': str(year_end)}
+    row.update(zip(RANGE_KEY_FIELDS, key))
+    return row
+
+
+def compact_records(records):
+    """Yield compacted rows from per-year fitment records.
+    Ranges grow in either direction, so the scraper's newest-first order
+    compacts as well as oldest-first; unordered years only compact less."""
+    open_ranges = {}
+    for record in records:
+        key = tuple(record[field] for field in RANGE_KEY_FIELDS)
+        year = int(record['year'])
+        current = open_ranges.get(key)
+        if current:
+            start, end = current
+            if start <= year <= end:
+                continue  # duplicate row
+            if year == end + 1:
+                current[1] = year
+                continue
+            if year == start - 1:
+                current[0] = year
+                continue
+            yield _range_row(key, start, end)
+        open_ranges[key] = [year, year]
+
+    for key, (start, end) in open_ranges.items():
+        yield _range_row(key, start, end)
+
+
+def expand_records(rows):
+    """Yield the per-year fitment records described by compacted rows"""
+    for row in rows:
+        for year in range(int(row['year_start']), int(row['year_end']) + 1):
+            record = {'year': str(year), 'year_value': str(year)}
+            record.update((field, row[field]) for field in RANGE_KEY_FIELDS)
+            yield {field: record[field] for field in FITMENT_FIELDS}
+
+
+def _convert_csv(input_file, output_file, convert, fieldnames):
+    count = 0
+    with open(input_file, 'r', newline='', encoding='utf-8') as source, \
+            open(output_file, 'w', newline='', encoding='utf-8') as target:
+        writer = csv.DictWriter(target, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in convert(csv.DictReader(source)):
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def compact_csv(input_file, output_file):
+    """Compact a per-year fitment CSV, returning the number of rows written"""
+    return _convert_csv(input_file, output_file, compact_records, COMPACT_FIELDS)
+
+
+def expand_csv(input_file, output_file):
+    """Expand a compacted fitment CSV, returning the number of rows written"""
+    return _convert_csv(input_file, output_file, expand_records, FITMENT_FIELDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert between per-year and year-range fitment CSVs')
+    parser.add_argument('direction', choices=['compact', 'expand'])
+    parser.add_argument('input', help='CSV file to read')
+    parser.add_argument('output', help='CSV file to write')
+    args = parser.parse_args()
+
+    convert = compact_csv if args.direction == 'compact' else expand_csv
+    count = convert(args.input, args.output)
+    print(f"Wrote {count} rows to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,9 +4,17 @@ Simple runner script for the Sylvania fitment data scraper.
 This script provides an easy way to run the scraper with different configurations.
 """
 
+import os
 import sys
 import argparse
+import logging
 from enhanced_sylvania_scraper import EnhancedSylvaniaFitmentScraper
+from bulb_enrichment import BulbPartEnricher, load_fitment_csv
+from crawl_planner import (CrawlHistory, CrawlPlanner, save_plan, load_plan, format_plan_summary,
+                           worker_file, merge_worker_outputs)
+from scraper_logging import configure_logging
+from crawl_cassette import Cassette, CassetteServer, ReplayDriver
+from crawl_profiler import CrawlProfiler
 
 def main():
     parser = argparse.ArgumentParser(description='Sylvania Fitment Data Scraper')
@@ -18,14 +26,63 @@ def main():
                         help='Enable proxy rotation (requires proxy list)')
     parser.add_argument('--proxy-file', type=str,
                         help='File containing proxy list (one per line)')
-    parser.add_argument('--output', type=str, default='sylvania_fitment_data.csv',
-                        help='Output CSV filename (default: sylvania_fitment_data.csv)')
+    parser.add_argument('--output', type=str,
+                        help='Output CSV filename (default: sylvania_fitment_data.csv, <cassette>_replay.csv when replaying)')
+    parser.add_argument('--compact-output', action='store_true', default=False,
+                        help='Collapse consecutive years into year_start/year_end ranges in the output CSV')
     parser.add_argument('--min-delay', type=float, default=3.0,
                         help='Minimum delay between requests in seconds (default: 3.0)')
     parser.add_argument('--max-delay', type=float, default=7.0,
                         help='Maximum delay between requests in seconds (default: 7.0)')
+    parser.add_argument('--enrich', action='store_true', default=False,
+                        help='Fetch bulb part numbers for every scraped position after scraping')
+    parser.add_argument('--enrich-only', action='store_true', default=False,
+                        help='Skip scraping and only enrich the existing output CSV')
+    parser.add_argument('--enrich-workers', type=int, default=4,
+                        help='Concurrent part-number fetches during enrichment (default: 4)')
+    parser.add_argument('--enrich-url', type=str,
+                        help='Results page URL template for enrichment, containing {position_value} (required with --enrich)')
+    parser.add_argument('--plan-only', action='store_true', default=False,
+                        help='Enumerate years and makes, estimate the crawl and save a plan without scraping')
+    parser.add_argument('--plan-models', action='store_true', default=False,
+                        help='Also enumerate models while planning (slower, more accurate estimate)')
+    parser.add_argument('--plan-file', type=str,
+                        help='Plan to follow when scraping; --plan-only writes it (default: crawl_plan.json)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of parallel workers to schedule in the plan (default: 1)')
+    parser.add_argument('--worker-index', type=int, default=0,
+                        help='Which worker of the plan this process runs (default: 0)')
+    parser.add_argument('--merge-workers', action='store_true', default=False,
+                        help='Merge the worker CSVs of --plan-file into --output, then compact/enrich it if requested')
+    parser.add_argument('--recycle-pages', type=int, default=400,
+                        help='Restart the browser after this many page actions, 0 to disable (default: 400)')
+    parser.add_argument('--recycle-minutes', type=float, default=45,
+                        help='Restart the browser after this many minutes, 0 to disable (default: 45)')
+    parser.add_argument('--max-rss-mb', type=float, default=1500,
+                        help='Restart the browser when Chrome uses more memory than this, 0 to disable (default: 1500)')
+    parser.add_argument('--verbose', action='store_true', default=False,
+                        help='Log every model and a sample of added records at debug level')
+    parser.add_argument('--log-json', type=str,
+                        help='Also write structured JSON logs, one object per line, to this file')
+    parser.add_argument('--record', type=str,
+                        help='Record every cascade response to this cassette file (e.g. crawl.cassette.gz)')
+    parser.add_argument('--replay', type=str,
+                        help='Replay a recorded cassette instead of contacting the website (disables delays)')
+    parser.add_argument('--replay-mode', choices=['driver', 'http'], default='driver',
+                        help='Replay through a stand-in driver without a browser, or a local HTTP page for Chrome (default: driver)')
+    parser.add_argument('--replay-speed', type=float, default=0.0,
+                        help='Replay speed relative to the recorded load times, 0 for no waiting (default: 0)')
+    parser.add_argument('--profile', action='store_true', default=False,
+                        help='Profile the run: cProfile stats, folded stacks and a CPU/memory report')
+    parser.add_argument('--profile-output', type=str, default='crawl_profile',
+                        help='Prefix for the profile files (default: crawl_profile)')
     
     args = parser.parse_args()
+    if (args.enrich or args.enrich_only) and not args.enrich_url:
+        parser.error('--enrich and --enrich-only need --enrich-url with the results page address')
+    if args.merge_workers and not args.plan_file:
+        parser.error('--merge-workers needs the --plan-file the workers ran')
+    configure_logging(level=logging.DEBUG if args.verbose else logging.INFO, json_file=args.log_json)
     
     # Load proxy list if specified
     proxy_list = []
@@ -48,23 +105,107 @@ def main():
     # Configure delays
     scraper.min_delay = args.min_delay
     scraper.max_delay = args.max_delay
-    scraper.output_file = args.output
+    scraper.output_file = args.output or 'sylvania_fitment_data.csv'
+    scraper.compact_output = args.compact_output
+    scraper.watchdog.max_pages = args.recycle_pages
+    scraper.watchdog.max_minutes = args.recycle_minutes
+    scraper.watchdog.max_rss_mb = args.max_rss_mb
+    
+    replay_server = None
+    if args.record:
+        scraper.cassette = Cassette(args.record)
+        # A resumed crawl skips what it already did, so keep the responses recorded before the stop
+        if os.path.exists(args.record):
+            scraper.cassette.load()
+        else:
+            scraper.resume = False
+    if args.replay:
+        cassette = Cassette(args.replay).load()
+        # Nobody to be polite to when the responses come from a file
+        scraper.min_delay = scraper.max_delay = scraper.model_delay = 0
+        # Keep replays away from the real progress, output and history files
+        replay_prefix = os.path.join(os.path.dirname(args.replay), os.path.basename(args.replay).split('.')[0])
+        scraper.output_file = args.output or f"{replay_prefix}_replay.csv"
+        scraper.progress_file = f"{replay_prefix}_replay_progress.json"
+        scraper.history = CrawlHistory(f"{replay_prefix}_replay_history.json")
+        scraper.resume = False
+        scraper.record_history = False
+        if args.replay_mode == 'http':
+            replay_server = CassetteServer(cassette, speed=args.replay_speed).start()
+            scraper.base_url = replay_server.url
+        else:
+            scraper.driver_factory = lambda: ReplayDriver(cassette, speed=args.replay_speed)
+    
+    if args.plan_only:
+        planner = CrawlPlanner(scraper, history=scraper.history, include_models=args.plan_models)
+        plan = planner.build_plan(workers=args.workers)
+        plan_file = args.plan_file or 'crawl_plan.json'
+        save_plan(plan, plan_file)
+        print(format_plan_summary(plan))
+        print(f"Plan saved to {plan_file}")
+        return
+    
+    if args.merge_workers:
+        plan = load_plan(args.plan_file)
+        try:
+            merge_worker_outputs(scraper.output_file, len(plan['workers']), compact=args.compact_output)
+            if args.enrich or args.enrich_only:
+                enricher = BulbPartEnricher(results_url=args.enrich_url, max_workers=args.enrich_workers)
+                enricher.run(load_fitment_csv(scraper.output_file))
+                print(f"Enriched data saved to {enricher.output_file}")
+        except Exception as e:
+            print(f"Error merging worker output: {e}")
+            sys.exit(1)
+        print(f"Merged worker output saved to {scraper.output_file}")
+        return
+    
+    if args.plan_file:
+        plan = load_plan(args.plan_file)
+        if not 0 <= args.worker_index < len(plan['workers']):
+            print(f"Error: worker index {args.worker_index} not in plan with {len(plan['workers'])} workers")
+            sys.exit(1)
+        scraper.set_plan(plan, args.worker_index)
+        # Each worker keeps its own progress and output so they can run side by side
+        if len(plan['workers']) > 1:
+            # One make's years are split across workers, so compaction and enrichment
+            # only make sense on the merged output
+            if args.compact_output or args.enrich or args.enrich_only:
+                print("Error: --compact-output and --enrich need the whole crawl; run each worker without them, "
+                      "then combine the results with --merge-workers")
+                sys.exit(1)
+            scraper.output_file = worker_file(scraper.output_file, args.worker_index)
+            scraper.progress_file = worker_file(scraper.progress_file, args.worker_index)
+            scraper.browser_pidfile = worker_file(scraper.browser_pidfile, args.worker_index)
+            scraper.history.output_file = scraper.history.worker_file(args.worker_index)
+        print(format_plan_summary(plan))
     
     print("Starting Sylvania fitment data scraper...")
     print(f"Headless mode: {args.headless}")
     print(f"Using proxies: {args.use_proxy}")
-    print(f"Delays: {args.min_delay}-{args.max_delay} seconds")
-    print(f"Output file: {args.output}")
+    print(f"Delays: {scraper.min_delay}-{scraper.max_delay} seconds")
+    print(f"Output file: {scraper.output_file}")
     print("-" * 50)
     
     try:
-        scraper.run()
-        print("\nScraping completed successfully!")
+        if not args.enrich_only:
+            if args.profile:
+                scraper.profiler = CrawlProfiler(output_prefix=args.profile_output)
+                scraper.profiler.run(scraper.run)
+            else:
+                scraper.run()
+            print("\nScraping completed successfully!")
+        if args.enrich or args.enrich_only:
+            enricher = BulbPartEnricher(results_url=args.enrich_url, max_workers=args.enrich_workers)
+            enricher.run(load_fitment_csv(scraper.output_file))
+            print(f"Enriched data saved to {enricher.output_file}")
     except KeyboardInterrupt:
         print("\nScraping interrupted by user")
     except Exception as e:
         print(f"\nError during scraping: {e}")
         sys.exit(1)
+    finally:
+        if replay_server:
+            replay_server.stop()
 
 if __name__ == "__main__":
     main()
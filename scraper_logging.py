@@ -0,0 +1,135 @@
+"""
+Logging setup for the scraper.
+
+Log records are handed to a QueueHandler and written by a QueueListener
+thread, so the crawl loop never blocks on stderr or file I/O. Optional JSON
+lines output is available for log shipping, and ProgressLine replaces the
+per-record log lines with one throttled status line.
+"""
+
+import atexit
+import copy
+import json
+import queue
+import sys
+import time
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for shipping logs to an aggregator"""
+
+    def format(self, record):
+        entry = {
+            'time': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry)
+
+
+class TracebackQueueHandler(QueueHandler):
+    """QueueHandler that keeps the traceback apart from the message.
+    The stock prepare() folds it into msg, which hides it from JsonFormatter."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.message = record.msg
+        record.args = None
+        # Formatters append exc_text themselves; the traceback object is not queued
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def configure_logging(level=logging.INFO, json_file=None, stream=None):
+    """Route all logging through a queue; calling again replaces the previous setup.
+    Console output goes to stream, stderr by default."""
+    global _listener
+    if _listener:
+        _listener.stop()
+
+    stream = stream or sys.stderr
+    stream_handler = logging.StreamHandler(stream)
+    # On a terminal, clear any progress line before writing a log line over it
+    prefix = '\r\033[K' if stream.isatty() else ''
+    stream_handler.setFormatter(logging.Formatter(prefix + LOG_FORMAT))
+    handlers = [stream_handler]
+    if json_file:
+        json_handler = logging.FileHandler(json_file, encoding='utf-8')
+        json_handler.setFormatter(JsonFormatter())
+        handlers.append(json_handler)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(TracebackQueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records; registered to run at interpreter exit"""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+class ProgressLine:
+    """Throttled single-line progress display with records/sec and the current node.
+    Rewrites one terminal line in place, or logs at the interval when not on a TTY."""
+
+    def __init__(self, interval=2.0, stream=None):
+        self.stream = stream or sys.stderr
+        self.interactive = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        # Non-interactive output keeps every line, so update it less often
+        self.interval = interval if self.interactive else max(interval, 30.0)
+        self.records = 0
+        self.node = ""
+        self.started = time.time()
+        self.last_shown = 0.0
+
+    def update(self, records=0, node=None):
+        self.records += records
+        if node:
+            self.node = node
+        now = time.time()
+        if now - self.last_shown >= self.interval:
+            self.last_shown = now
+            self.show(now)
+
+    def show(self, now=None):
+        elapsed = (now or time.time()) - self.started
+        rate = self.records / elapsed if elapsed else 0.0
+        line = f"{self.records} records, {rate:.2f}/s - {self.node}"
+        if self.interactive:
+            self.stream.write(f"\r\033[K{line}")
+            self.stream.flush()
+        else:
+            logging.getLogger(__name__).info(line)
+
+    def close(self):
+        if self.interactive and self.last_shown:
+            self.show()
+            self.stream.write("\n")
+            self.stream.flush()
@@ -0,0 +1,49 @@
+"""
+Regression tests for part-number parsing in the enrichment stage.
+"""
+
+import pytest
+
+from bulb_enrichment import PART_NUMBER_PATTERN, BulbPartEnricher
+
+
+def part_numbers(text):
+    return [match.group(1) for match in PART_NUMBER_PATTERN.finditer(text)]
+
+
+def test_pattern_needs_word_boundary_after_no_and_number():
+    assert part_numbers("Part Notes: bright white light") == []
+    assert part_numbers("Part Numbers vary by trim") == []
+    assert part_numbers("Part No. H11SU") == ["H11SU"]
+    assert part_numbers("Part Number: 9006XV") == ["9006XV"]
+    assert part_numbers("Part #: 194LL") == ["194LL"]
+
+
+def test_pattern_keeps_dotted_suffix_without_trailing_period():
+    assert part_numbers("Part #: 9012SU.BP2.") == ["9012SU.BP2"]
+
+
+def test_parse_results_ignores_part_notes_in_page_text():
+    html = """
+    <div class="product"><h3>SilverStar ULTRA</h3><p>Part #: 9012SU.BP2</p></div>
+    <p>Part Notes: sold in pairs</p>
+    """
+    parts = BulbPartEnricher().parse_results(html)
+    assert parts == [{'product_name': 'SilverStar ULTRA', 'part_number': '9012SU.BP2'}]
+    assert BulbPartEnricher().parse_results("<p>Part Notes: sold in pairs</p>") == []
+
+
+def test_run_fails_when_no_position_can_be_fetched(tmp_path, monkeypatch):
+    enricher = BulbPartEnricher(results_url="http://127.0.0.1:9/results?position={position_value}",
+                                cache_file=str(tmp_path / "cache.json"))
+    enricher.output_file = str(tmp_path / "parts.csv")
+    monkeypatch.setattr(enricher, 'fetch_parts', lambda value: None)
+
+    with pytest.raises(RuntimeError, match="could be fetched"):
+        enricher.run([{'position_value': '1'}, {'position_value': '2'}])
+    assert not (tmp_path / "parts.csv").exists()
+
+
+def test_run_needs_a_results_url():
+    with pytest.raises(ValueError):
+        BulbPartEnricher().run([{'position_value': '1'}])
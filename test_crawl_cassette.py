@@ -0,0 +1,69 @@
+"""
+Offline crawl through a recorded cassette, as run in CI without a browser or network.
+"""
+
+import csv
+
+from crawl_cassette import Cassette, ReplayDriver, cassette_key
+from enhanced_sylvania_scraper import EnhancedSylvaniaFitmentScraper
+
+MAKES = [{'value': '3', 'text': 'Acura'}, {'value': '24', 'text': 'BMW'}]
+MODELS = {'3': [{'value': '21', 'text': 'Integra'}, {'value': '23', 'text': 'MDX'}],
+          '24': [{'value': '1123', 'text': 'X5'}]}
+POSITIONS = [{'value': '360194', 'text': 'Headlight Bulb Low Beam'},
+             {'value': '360186', 'text': 'Brake Light Bulb'}]
+
+
+def build_cassette(path):
+    cassette = Cassette(path)
+    cassette.record(cassette_key(0), [{'value': '2025', 'text': '2025'}, {'value': '2024', 'text': '2024'}])
+    for year in ['2025', '2024']:
+        cassette.record(cassette_key(1, [year]), MAKES, 0.2)
+        for make in MAKES:
+            cassette.record(cassette_key(2, [year, make['value']]), MODELS[make['value']], 0.2)
+            for model in MODELS[make['value']]:
+                cassette.record(cassette_key(3, [year, make['value'], model['value']]), POSITIONS, 0.1)
+    cassette.save()
+    return Cassette(path).load()
+
+
+def replay_scraper(tmp_path, cassette):
+    scraper = EnhancedSylvaniaFitmentScraper()
+    scraper.driver_factory = lambda: ReplayDriver(cassette)
+    scraper.min_delay = scraper.max_delay = scraper.model_delay = 0
+    scraper.resume = False
+    scraper.record_history = False
+    scraper.output_file = str(tmp_path / "replay.csv")
+    scraper.progress_file = str(tmp_path / "replay_progress.json")
+    return scraper
+
+
+def test_replay_crawl_writes_every_position(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cassette = build_cassette(str(tmp_path / "crawl.cassette.gz"))
+    scraper = replay_scraper(tmp_path, cassette)
+    scraper.cassette = Cassette(str(tmp_path / "rerecorded.cassette.gz"))
+    scraper.run()
+
+    with open(tmp_path / "replay.csv", newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    expected = {(year, make['text'], model['text'], position['text'])
+                for year in ['2025', '2024'] for make in MAKES
+                for model in MODELS[make['value']] for position in POSITIONS}
+    assert len(rows) == len(expected)
+    assert {(r['year'], r['make'], r['model'], r['bulb_position']) for r in rows} == expected
+    assert rows[0]['position_value'] == '360194'
+    # Recording a replay reproduces the cassette it came from
+    assert Cassette(scraper.cassette.path).load().entries.keys() == cassette.entries.keys()
+
+
+def test_replay_crawl_compacts_years(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    scraper = replay_scraper(tmp_path, build_cassette(str(tmp_path / "crawl.cassette.gz")))
+    scraper.compact_output = True
+    scraper.run()
+
+    with open(tmp_path / "replay.csv", newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 6
+    assert {(r['year_start'], r['year_end']) for r in rows} == {('2024', '2025')}
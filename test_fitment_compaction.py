@@ -0,0 +1,40 @@
+"""
+Round-trip tests for year-range compaction of the fitment output.
+"""
+
+from fitment_compaction import FITMENT_FIELDS, compact_records, expand_records
+
+
+def record(year, model='MDX', position='Brake Light Bulb', position_value='321545'):
+    values = [str(year), 'Acura', model, position, str(year), '3', '23' if model == 'MDX' else '21', position_value]
+    return dict(zip(FITMENT_FIELDS, values))
+
+
+def deduplicated(records):
+    return {tuple(sorted(r.items())) for r in records}
+
+
+def round_trip(records):
+    return deduplicated(expand_records(compact_records(records)))
+
+
+def test_newest_first_years_compact_to_one_range():
+    records = [record(year) for year in range(2025, 2017, -1)]
+    rows = list(compact_records(records))
+    assert [(r['year_start'], r['year_end']) for r in rows] == [('2018', '2025')]
+    assert round_trip(records) == deduplicated(records)
+
+
+def test_gap_in_years_splits_the_range():
+    records = [record(2025), record(2024), record(2022)]
+    rows = list(compact_records(records))
+    assert sorted((r['year_start'], r['year_end']) for r in rows) == [('2022', '2022'), ('2024', '2025')]
+    assert round_trip(records) == deduplicated(records)
+
+
+def test_duplicate_rows_are_dropped():
+    records = [record(2025), record(2025), record(2024), record(2025),
+               record(2024, model='Integra', position='Fog Light Bulb', position_value='321550'),
+               record(2024, model='Integra', position='Fog Light Bulb', position_value='321550')]
+    assert len(list(compact_records(records))) == 2
+    assert round_trip(records) == deduplicated(records)